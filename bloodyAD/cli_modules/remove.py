@@ -4,7 +4,6 @@ import badldap
 from bloodyAD import utils, ConnectionHandler
 from bloodyAD.exceptions import LOG
 from bloodyAD.formatters import accesscontrol, common, dns, cryptography
-from bloodyAD.exceptions import BloodyError
 from bloodyAD.network.ldap import Change
 
 
@@ -12,20 +11,17 @@ async def dcsync(conn: ConnectionHandler, trustee: str):
     """
     Remove DCSync right for provided trustee
 
-    :param trustee: sAMAccountName, DN or SID of the trustee
+    :param trustee: sAMAccountName, DN or SID of the trustee (can be a list of trustees when scripted)
     """
     ldap = await conn.getLdap()
     new_sd, _ = await utils.getSD(conn, ldap.domainNC)
-    if "s-1-" in trustee.lower():
-        trustee_sid = trustee
-    else:
-        entry = None
-        async for e in ldap.bloodysearch(trustee, attr=["objectSid"]):
-            entry = e
-            break
-        trustee_sid = entry["objectSid"]
+    # Accepts a list of trustees so scripted mass removals cost two requests instead of 2N
+    trustees = trustee if isinstance(trustee, list) else [trustee]
+    sid_map = await utils.resolveSids(conn, trustees)
     access_mask = accesscontrol.ACCESS_FLAGS["ADS_RIGHT_DS_CONTROL_ACCESS"]
-    utils.delRight(new_sd, trustee_sid, access_mask)
+    if not utils.delRight(new_sd, sid_map.values(), access_mask):
+        LOG.warning("No DCSync right found, no modification will be made")
+        return
 
     req_flags = badldap.wintypes.asn1.sdflagsrequest.SDFlagsRequestValue(
         {"Flags": accesscontrol.DACL_SECURITY_INFORMATION}
@@ -38,7 +34,7 @@ async def dcsync(conn: ConnectionHandler, trustee: str):
         controls,
     )
 
-    LOG.info(f"{trustee} can't DCSync anymore")
+    LOG.info(f"{', '.join(trustees)} can't DCSync anymore")
 
 
 async def dnsRecord(
@@ -72,15 +68,12 @@ async def dnsRecord(
     ldap = await conn.getLdap()
     naming_context = "," + ldap.domainNC
     if zone == "CurrentDomain":
-        zone = ""
-        for label in naming_context.split(",DC="):
-            if label:
-                zone += "." + label
+        # Domain DNS name is the dot-joined DC components of the NC
+        zone = ".".join(
+            label[3:] for label in ldap.domainNC.split(",") if label[:3].upper() == "DC="
+        )
         if forest:
-            zone = "_msdcs" + zone
-        else:
-            # Removes first dot
-            zone = zone[1:]
+            zone = "_msdcs." + zone
 
     # TODO: take into account custom ForestDnsZones and DomainDnsZones partition name ?
     if forest:
@@ -91,32 +84,57 @@ async def dnsRecord(
     zone_dn = f",DC={zone},CN=MicrosoftDNS,DC={zone_type}{naming_context}"
     record_dn = f"DC={name}{zone_dn}"
 
-    record_to_remove = None
     entry = None
     async for e in ldap.bloodysearch(record_dn, attr=["dnsRecord"], raw=True):
         entry = e
         break
-    dns_list = entry["dnsRecord"]
-    for raw_record in dns_list:
-        record = dns.Record(raw_record)
-        tmp_record = dns.Record()
-
-        if not ttl:
-            ttl = record["TtlSeconds"]
-        tmp_record.fromDict(
-            data,
-            dnstype,
-            ttl,
-            record["Rank"],
-            record["Serial"],
-            preference,
-            port,
-            priority,
-            weight,
-        )
-        if tmp_record.getData() == raw_record:
-            record_to_remove = raw_record
-            break
+    dns_list = entry.get("dnsRecord", [])
+    if not dns_list:
+        # The node exists but holds no record, e.g. it has been tombstoned
+        LOG.warning("Record not found")
+        return
+
+    # The first record gives us the zone metadata (Rank/Serial and TTL fallback)
+    # needed to serialize the record we're looking for
+    first_record = dns.Record(dns_list[0])
+    if not ttl:
+        ttl = first_record["TtlSeconds"]
+    tmp_record = dns.Record()
+    tmp_record.fromDict(
+        data,
+        dnstype,
+        ttl,
+        first_record["Rank"],
+        first_record["Serial"],
+        preference,
+        port,
+        priority,
+        weight,
+    )
+
+    record_to_remove = None
+    target_data = tmp_record.getData()
+    if target_data in dns_list:
+        # Pure bytes comparison against the serialized target, no per-record decode
+        record_to_remove = target_data
+    else:
+        # Slow path for records whose Rank/Serial doesn't match the first one
+        for raw_record in dns_list:
+            record = dns.Record(raw_record)
+            tmp_record.fromDict(
+                data,
+                dnstype,
+                ttl,
+                record["Rank"],
+                record["Serial"],
+                preference,
+                port,
+                priority,
+                weight,
+            )
+            if tmp_record.getData() == raw_record:
+                record_to_remove = raw_record
+                break
 
     if not record_to_remove:
         LOG.warning("Record not found")
@@ -137,19 +155,15 @@ async def genericAll(conn: ConnectionHandler, target: str, trustee: str):
     Remove full control of trustee on target
 
     :param target: sAMAccountName, DN or SID of the target
-    :param trustee: sAMAccountName, DN or SID of the trustee
+    :param trustee: sAMAccountName, DN or SID of the trustee (can be a list of trustees when scripted)
     """
     ldap = await conn.getLdap()
     new_sd, _ = await utils.getSD(conn, target)
-    if "s-1-" in trustee.lower():
-        trustee_sid = trustee
-    else:
-        entry = None
-        async for e in ldap.bloodysearch(trustee, attr=["objectSid"]):
-            entry = e
-            break
-        trustee_sid = entry["objectSid"]
-    utils.delRight(new_sd, trustee_sid)
+    trustees = trustee if isinstance(trustee, list) else [trustee]
+    sid_map = await utils.resolveSids(conn, trustees)
+    if not utils.delRight(new_sd, sid_map.values()):
+        LOG.warning(f"No right found on {target}, no modification will be made")
+        return
 
     req_flags = badldap.wintypes.asn1.sdflagsrequest.SDFlagsRequestValue(
         {"Flags": accesscontrol.DACL_SECURITY_INFORMATION}
@@ -162,7 +176,7 @@ async def genericAll(conn: ConnectionHandler, target: str, trustee: str):
         controls,
     )
 
-    LOG.info(f"{trustee} doesn't have GenericAll on {target} anymore")
+    LOG.info(f"{', '.join(trustees)} doesn't have GenericAll on {target} anymore")
 
 
 async def groupMember(conn: ConnectionHandler, group: str, member: str):
@@ -170,23 +184,33 @@ async def groupMember(conn: ConnectionHandler, group: str, member: str):
     Remove member (user, group, computer) from group
 
     :param group: sAMAccountName, DN or SID of the group
-    :param member: sAMAccountName, DN or SID of the member
+    :param member: sAMAccountName, DN or SID of the member (can be a list of members when scripted)
     """
     # This is equivalent to classic add member,
     # see [MS-ADTS] - 3.1.1.3.1.2.4 Alternative Forms of DNs
     # But <SID='sid'> also has the advantage of being compatible with foreign security principals,
     # see [MS-ADTS] - 3.1.1.5.3.3 Processing Specifics
     ldap = await conn.getLdap()
-    if "s-1-" in member.lower():
-        # We assume member is an SID
-        member_transformed = f"<SID={member}>"
-    else:
-        member_transformed = await ldap.dnResolver(member)
+    members = member if isinstance(member, list) else [member]
+    members_transformed = []
+    to_resolve = []
+    for m in members:
+        if "s-1-" in m.lower():
+            # We assume member is an SID
+            members_transformed.append(f"<SID={m}>")
+        elif ",dc=" in m.lower():
+            # DNs may come from another trusted domain, don't try to resolve them
+            members_transformed.append(m)
+        else:
+            to_resolve.append(m)
+    if to_resolve:
+        sid_map = await utils.resolveSids(conn, to_resolve)
+        members_transformed += [f"<SID={sid}>" for sid in sid_map.values()]
 
     await ldap.bloodymodify(
-        group, {"member": [(Change.DELETE.value, member_transformed)]}
+        group, {"member": [(Change.DELETE.value, members_transformed)]}
     )
-    LOG.info(f"{member} removed from {group}")
+    LOG.info(f"{', '.join(members)} removed from {group}")
 
 
 async def object(conn: ConnectionHandler, target: str):
@@ -205,23 +229,19 @@ async def rbcd(conn: ConnectionHandler, target: str, service: str):
     Remove Resource Based Constraint Delegation for service on target
 
     :param target: sAMAccountName, DN or SID of the target
-    :param service: sAMAccountName, DN or SID of the service account
+    :param service: sAMAccountName, DN or SID of the service account (can be a list of services when scripted)
     """
     ldap = await conn.getLdap()
     control_flag = 0
     new_sd, _ = await utils.getSD(
         conn, target, "msDS-AllowedToActOnBehalfOfOtherIdentity", control_flag
     )
-    if "s-1-" in service.lower():
-        service_sid = service
-    else:
-        entry = None
-        async for e in ldap.bloodysearch(service, attr=["objectSid"]):
-            entry = e
-            break
-        service_sid = entry["objectSid"]
+    services = service if isinstance(service, list) else [service]
+    sid_map = await utils.resolveSids(conn, services)
     access_mask = accesscontrol.ACCESS_FLAGS["ADS_RIGHT_DS_CONTROL_ACCESS"]
-    utils.delRight(new_sd, service_sid, access_mask)
+    if not utils.delRight(new_sd, sid_map.values(), access_mask):
+        LOG.warning(f"No delegation right found on {target}, no modification will be made")
+        return
 
     attr_values = []
     if len(new_sd["Dacl"].aces) > 0:
@@ -238,7 +258,7 @@ async def rbcd(conn: ConnectionHandler, target: str, service: str):
         },
     )
 
-    LOG.info(f"{service} can't impersonate users on {target} anymore")
+    LOG.info(f"{', '.join(services)} can't impersonate users on {target} anymore")
 
 
 async def shadowCredentials(conn: ConnectionHandler, target: str, key: str = None):
@@ -249,6 +269,15 @@ async def shadowCredentials(conn: ConnectionHandler, target: str, key: str = Non
     :param key: RSA key of Key Credentials to remove from the target, removes all if key not specified
     """
     ldap = await conn.getLdap()
+    if not key:
+        # Removing everything doesn't need the read+filter pass, one replace does it
+        await ldap.bloodymodify(
+            target, {"msDS-KeyCredentialLink": [(Change.REPLACE.value, [])]}
+        )
+        LOG.info("All keys removed")
+        return
+
+    key_bytes = binascii.unhexlify(key)
     entry = None
     async for e in ldap.bloodysearch(target, attr=["msDS-KeyCredentialLink"], raw=True):
         entry = e
@@ -258,8 +287,7 @@ async def shadowCredentials(conn: ConnectionHandler, target: str, key: str = Non
     isFound = False
     for keyCred in keyCreds:
         key_raw = common.DNBinary(keyCred).value
-        key_blob = cryptography.KEYCREDENTIALLINK_BLOB(key_raw)
-        if key and key_blob.getKeyID() != binascii.unhexlify(key):
+        if cryptography.peekKeyID(key_raw) != key_bytes:
             newKeyCreds.append(keyCred.decode())
         else:
             isFound = True
@@ -268,12 +296,11 @@ async def shadowCredentials(conn: ConnectionHandler, target: str, key: str = Non
     if not isFound:
         LOG.warning("No key found")
         return
-       
+
     await ldap.bloodymodify(
         target, {"msDS-KeyCredentialLink": [(Change.REPLACE.value, newKeyCreds)]}
     )
-    str_key = key if key else "All keys"
-    LOG.info(f"{str_key} removed")
+    LOG.info(f"{key} removed")
 
 
 async def uac(conn: ConnectionHandler, target: str, f: list = None):
@@ -288,26 +315,7 @@ async def uac(conn: ConnectionHandler, target: str, f: list = None):
     for flag in f:
         uac |= accesscontrol.ACCOUNT_FLAGS[flag]
 
-    try:
-        entry = None
-        async for e in ldap.bloodysearch(target, attr=["userAccountControl"], raw=True):
-            entry = e
-            break
-        old_uac = entry["userAccountControl"][0]
-    except IndexError as e:
-        entry = None
-        async for search_entry in ldap.bloodysearch(target, attr=["allowedAttributes"]):
-            entry = search_entry
-            break
-        for allowed in entry["allowedAttributes"]:
-            if "userAccountControl" in allowed:
-                raise BloodyError(
-                    "Current user doesn't have the right to read userAccountControl on"
-                    f" {target}"
-                ) from e
-        raise BloodyError(f"{target} doesn't have userAccountControl attribute") from e
-
-    uac = int(old_uac) & ~uac
+    uac = await utils.getUserAccountControl(conn, target) & ~uac
     await ldap.bloodymodify(
         target, {"userAccountControl": [(Change.REPLACE.value, uac)]}
     )
@@ -73,11 +73,7 @@ async def owner(conn, target: str, owner: str):
     :param owner: sAMAccountName, DN or SID of the new owner
     """
     ldap = await conn.getLdap()
-    entry = None
-    async for e in ldap.bloodysearch(owner, attr=["objectSid"]):
-        entry = e
-        break
-    new_sid = entry["objectSid"] if entry else None
+    new_sid = (await utils.resolveSids(conn, [owner]))[owner]
 
     new_sd, _ = await utils.getSD(
         conn, target, "nTSecurityDescriptor", accesscontrol.OWNER_SECURITY_INFORMATION
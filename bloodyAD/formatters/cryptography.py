@@ -123,6 +123,22 @@ class KEYCREDENTIALLINK_BLOB(Structure):
         ][0]
 
 
+def peekKeyID(raw_blob):
+    """
+    Return the KeyID value of a raw KEYCREDENTIALLINK_BLOB without decoding the
+    full entry list, entries are [Length(2)][Identifier(1)][Value] after the
+    4 bytes version header ([MS-ADTS] 2.2.20.2)
+    """
+    keyid_identifier = KEYCREDENTIALLINK_ENTRY.identifiers["KeyID"]
+    offset = 4
+    while offset + 3 <= len(raw_blob):
+        length = int.from_bytes(raw_blob[offset : offset + 2], "little")
+        if raw_blob[offset + 2] == keyid_identifier:
+            return raw_blob[offset + 3 : offset + 3 + length]
+        offset += 3 + length
+    raise IndexError("No KeyID entry found in KEYCREDENTIALLINK_BLOB")
+
+
 class MSDS_MANAGEDPASSWORD_BLOB(Structure):
     structure = (
         ("Version", "<H=0x01"),
@@ -1,7 +1,7 @@
 import dataclasses
 from dataclasses import dataclass
 from bloodyAD.network.ldap import Ldap
-import os, socket
+import asyncio, os, socket
 
 
 @dataclass
@@ -148,19 +148,23 @@ class ConnectionHandler:
         else:
             cnf = config
         self.conf = cnf
+        self._ldap_lock = asyncio.Lock()
 
     async def getLdap(self):
-        if not self._ldap:
-            self._ldap = await Ldap.create(self)
-        elif not self._ldap.isactive:
-            self._ldap = await Ldap.create(self)
-        return self._ldap
+        # Serialize the lazy creation so concurrent tasks share the same
+        # connection instead of racing to open one each, the underlying
+        # client pipelines their operations on it
+        async with self._ldap_lock:
+            if not self._ldap or not self._ldap.isactive:
+                self._ldap = await Ldap.create(self)
+            return self._ldap
 
     async def closeLdap(self):
-        if not self._ldap:
-            return
-        await self._ldap.close()
-        self._ldap = None
+        async with self._ldap_lock:
+            if not self._ldap:
+                return
+            await self._ldap.close()
+            self._ldap = None
 
     # kwargs takes the same arguments as the Config Class
     def copy(self, **kwargs):
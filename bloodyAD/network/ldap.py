@@ -30,6 +30,14 @@ class NCType(enum.IntFlag):
     ALL = PARTIAL_DOM | FULL_DOM | APP
 
 
+# Attributes holding a security descriptor, the only ones affected by the SDFlags control
+SD_ATTRIBUTES = (
+    "ntsecuritydescriptor",
+    "msds-groupmsamembership",
+    "msds-allowedtoactonbehalfofotheridentity",
+)
+
+
 @lru_cache
 def phantomRoot() -> list:
     # [MS-ADTS] 3.1.1.3.4.1.12
@@ -64,6 +72,9 @@ class Ldap(MSLDAPClient):
 
     def __init__(self, conn, target, credential):
         self._trustmap = collections.defaultdict(dict)
+        # identity->DN resolutions and LDAP policy are stable for the duration of a session
+        self._dn_cache = {}
+        self._policy = None
         self.conn = conn
         self.conf = conn.conf
         self.co_url = None
@@ -175,6 +186,9 @@ class Ldap(MSLDAPClient):
         if cnf.dns:
             params += "&dns=" + cnf.dns
 
+        # No SASL security layer is stacked on top of ldaps/gc-ssl here: the client
+        # only signs/seals at the SASL level on plain ldap, so TLS connections don't
+        # pay a second encryption pass per PDU (use -ss to strip everything for debug)
         # If auth has been defined in config we replace auth we built with it
         if cnf.auth:
             auth = cnf.auth + '-' + auth.split("-",1)[1]
@@ -241,6 +255,8 @@ class Ldap(MSLDAPClient):
         _, err = await self.delete(await self.dnResolver(target), *args)
         if err:
             raise err
+        # Cached DNs may now point to a removed entry
+        self._dn_cache.clear()
 
     async def dnResolver(self, identity):
         """
@@ -248,11 +264,17 @@ class Ldap(MSLDAPClient):
         Args:
             identity: sAMAccountName, DN, UPN, GPO name or SID of the object
         """
-        if ",dc=" in identity.lower():
-            # identity is a DN, return as is
+        low_identity = identity.lower()
+        if ",dc=" in low_identity or low_identity.startswith(("<sid=", "<guid=")):
+            # identity is a DN or an alternative form of DN ([MS-ADTS] 3.1.1.3.1.2.4)
+            # directly usable by the server, return as is
             # We do not try to validate it because it could be from another trusted domain
             return identity
 
+        cache_key = identity.upper()
+        if cache_key in self._dn_cache:
+            return self._dn_cache[cache_key]
+
         if identity.lower().startswith("s-1-"):
             # We assume identity is an SID
             ldap_filter = f"(objectSid={identity})"
@@ -293,6 +315,7 @@ class Ldap(MSLDAPClient):
                 )
             raise NoResultError(self.domainNC, ldap_filter)
 
+        self._dn_cache[cache_key] = dn
         return dn
 
     async def bloodymodify(self, target, changes, controls=None, encode=True, is_restore=False):
@@ -341,6 +364,8 @@ class Ldap(MSLDAPClient):
             _, err = await self._con.modify_dn(target_dn, new_rdn, newSuperior = new_superior)
             if err:
                 raise err
+            # Cached DNs may now point to the old location of the renamed entry
+            self._dn_cache.clear()
 
     @cached_property
     def current_site(self):
@@ -374,6 +399,9 @@ class Ldap(MSLDAPClient):
         """
         [MS-ADTS] - 3.1.1.3.4.6 LDAP Policies
         """
+        if self._policy:
+            return self._policy
+
         dict_policy = {"MaxPageSize": 1000}
 
         nTDSDSA_dn = self._serverinfo["dsServiceName"]
@@ -409,6 +437,7 @@ class Ldap(MSLDAPClient):
             param_name, _, param_val = raw_param.partition("=")
             dict_policy[param_name] = int(param_val)
 
+        self._policy = dict_policy
         return dict_policy
 
     async def getTrustMap(self, nctype=NCType.ALL):
@@ -465,8 +494,11 @@ class Ldap(MSLDAPClient):
 
         # Build a local controls list to avoid mutating caller-provided lists
         local_controls = list(controls) if controls else []
-        if control_flag:
-            # Search control to request security descriptor parts
+        if control_flag and any(
+            a == "*" or a.lower() in SD_ATTRIBUTES for a in attr
+        ):
+            # Search control to request security descriptor parts,
+            # only useful when a security descriptor attribute is fetched
             req_flags = SDFlagsRequestValue({"Flags": control_flag})
             local_controls.append(("1.2.840.113556.1.4.801", True, req_flags.dump()))
 
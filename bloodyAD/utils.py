@@ -1,11 +1,11 @@
-from bloodyAD.exceptions import LOG
+from bloodyAD.exceptions import LOG, BloodyError
 from bloodyAD.formatters import (
     ldaptypes,
     accesscontrol,
     adschema,
 )
 from bloodyAD.network.ldap import Scope, phantomRoot, showRecoverable
-import types, base64, collections, re
+import types, base64, collections, logging, re
 from winacl import dtyp
 from winacl.dtyp.security_descriptor import SECURITY_DESCRIPTOR
 from badldap.network import reacher
@@ -29,6 +29,7 @@ def addRight(
     else:
         access_denied_type = ldaptypes.ACCESS_DENIED_ACE.ACE_TYPE
     hasPriv = False
+    denyRemoved = False
 
     for ace in user_aces:
         new_mask = new_ace["Ace"]["Mask"]
@@ -37,6 +38,7 @@ def addRight(
         # Removes Access-Denied ACEs interfering
         if ace["AceType"] == access_denied_type and new_mask.hasPriv(mask["Mask"]):
             sd["Dacl"].aces.remove(ace)
+            denyRemoved = True
             LOG.debug("An interfering Access-Denied ACE has been removed:")
             LOG.debug(ace)
         # Adds ACE if not already added
@@ -49,8 +51,10 @@ def addRight(
     else:
         sd["Dacl"].aces.append(new_ace)
 
-    isAdded = not hasPriv
-    return isAdded
+    # An interfering deny removal mutates the SD even when the allow ACE is
+    # already there, so it must trigger a write back too
+    isSdChanged = not hasPriv or denyRemoved
+    return isSdChanged
 
 
 def delRight(
@@ -60,26 +64,31 @@ def delRight(
     object_type=None,
 ):
     isRemoved = False
-    user_sid = dtyp.sid.SID.from_string(user_sid)
-    user_aces = [
-        ace
-        for ace in sd["Dacl"].aces
-        if ace["Ace"]["Sid"].getData() == user_sid.to_bytes()
-    ]
+    # Accepts several SIDs at once so bulk removals pay a single pass on large DACLs
+    sid_list = [user_sid] if isinstance(user_sid, str) else user_sid
+    sid_index = {dtyp.sid.SID.from_string(sid).to_bytes() for sid in sid_list}
     if object_type:
         access_allowed_type = ldaptypes.ACCESS_ALLOWED_OBJECT_ACE.ACE_TYPE
     else:
         access_allowed_type = ldaptypes.ACCESS_ALLOWED_ACE.ACE_TYPE
 
-    for ace in user_aces:
+    aces = sd["Dacl"].aces
+    empty_aces = []
+    for i, ace in enumerate(aces):
+        if ace["Ace"]["Sid"].getData() not in sid_index:
+            continue
         mask = ace["Ace"]["Mask"]
         if ace["AceType"] == access_allowed_type and mask.hasPriv(access_mask):
             mask.removePriv(access_mask)
             LOG.debug("Privilege Removed")
             if mask["Mask"] == 0:
-                sd["Dacl"].aces.remove(ace)
+                empty_aces.append(i)
             isRemoved = True
 
+    # Delete emptied ACEs by index in reverse so remaining positions stay valid
+    for i in reversed(empty_aces):
+        del aces[i]
+
     if not isRemoved:
         LOG.debug("No right to remove")
     return isRemoved
@@ -107,13 +116,105 @@ async def getSD(
     else:
         sd = ldaptypes.SR_SECURITY_DESCRIPTOR(data=sd_data[0])
 
-    LOG.debug(
-        "Old Security Descriptor: "
-        + "\t".join([SECURITY_DESCRIPTOR.from_bytes(sd).to_sddl() for sd in sd_data])
-    )
+    # SDDL rendering parses every descriptor again, don't pay for it unless debug is on
+    if LOG.isEnabledFor(logging.DEBUG):
+        LOG.debug(
+            "Old Security Descriptor: "
+            + "\t".join([SECURITY_DESCRIPTOR.from_bytes(sd).to_sddl() for sd in sd_data])
+        )
     return sd, sd_data
 
 
+async def getUserAccountControl(conn, target):
+    """
+    Fetch target's userAccountControl in one request
+
+    The allowedAttributes lookup telling an unreadable attribute from a
+    missing one is only paid on the error path
+    """
+    ldap = await conn.getLdap()
+    entry = None
+    async for e in ldap.bloodysearch(target, attr=["userAccountControl"], raw=True):
+        entry = e
+        break
+    try:
+        return int(entry["userAccountControl"][0])
+    except (KeyError, IndexError) as e:
+        async for probe in ldap.bloodysearch(
+            target, attr=["allowedAttributes"], raw=True
+        ):
+            entry = probe
+            break
+        for allowed in entry.get("allowedAttributes", []):
+            if b"userAccountControl" in allowed:
+                raise BloodyError(
+                    "Current user doesn't have the right to read userAccountControl on"
+                    f" {target}"
+                ) from e
+        raise BloodyError(f"{target} doesn't have userAccountControl attribute") from e
+
+
+async def resolveSids(conn, identities):
+    """
+    Resolve objectSid for the provided identities in a minimal number of LDAP requests
+
+    :param identities: iterable of sAMAccountName, DN, UPN or SID of the objects to resolve
+    Returns a {identity: sid} dict, SID identities are mapped to themselves without a lookup
+    """
+    ldap = await conn.getLdap()
+    sid_map = {}
+    # Group identities to resolve by the attribute we'll have to filter on,
+    # keeping every provided spelling of a same normalized value
+    pending = collections.defaultdict(lambda: collections.defaultdict(list))
+    for identity in identities:
+        if "s-1-" in identity.lower():
+            sid_map[identity] = identity
+        elif ",dc=" in identity.lower():
+            pending["distinguishedName"][identity.upper()].append(identity)
+        elif "@" in identity:
+            pending["userPrincipalName"][identity.upper()].append(identity)
+        else:
+            pending["sAMAccountName"][identity.upper()].append(identity)
+
+    # WARNING: only 512 filters max per request
+    filters = []
+    buffer_filter = ""
+    filter_nb = 0
+    for attr_name, attr_identities in pending.items():
+        for identity_spellings in attr_identities.values():
+            if filter_nb > 511:
+                filters.append(buffer_filter)
+                buffer_filter = ""
+                filter_nb = 0
+            buffer_filter += f"({attr_name}={identity_spellings[0]})"
+            filter_nb += 1
+    if buffer_filter:
+        filters.append(buffer_filter)
+
+    for ldap_filter in filters:
+        async for entry in ldap.bloodysearch(
+            ldap.domainNC,
+            ldap_filter=f"(|{ldap_filter})",
+            search_scope=Scope.SUBTREE,
+            attr=["objectSid", "sAMAccountName", "userPrincipalName"],
+        ):
+            for attr_name, attr_identities in pending.items():
+                attr_value = entry.get(attr_name)
+                if attr_value and attr_value.upper() in attr_identities:
+                    for identity in attr_identities[attr_value.upper()]:
+                        sid_map[identity] = entry["objectSid"]
+
+    # DN spellings differing from the server's canonical one (extra spaces,
+    # escaped characters) won't string-match above, resolve the leftovers one
+    # by one as a base search on the identity itself
+    for identity in identities:
+        if identity not in sid_map:
+            async for entry in ldap.bloodysearch(identity, attr=["objectSid"]):
+                sid_map[identity] = entry["objectSid"]
+                break
+    return sid_map
+
+
 # First elt in grouping order is the first grouping criterium
 def groupBy(rows, grouping_order):
     try:
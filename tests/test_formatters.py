@@ -1,5 +1,11 @@
+import hashlib
 import unittest
 from bloodyAD.formatters import formatters
+from bloodyAD.formatters.cryptography import (
+    KEYCREDENTIALLINK_BLOB,
+    KEYCREDENTIALLINK_ENTRY,
+    peekKeyID,
+)
 
 
 class FormatterTests(unittest.TestCase):
@@ -135,5 +141,57 @@ class FormatterTests(unittest.TestCase):
         self.assertEqual(result, attributes)
 
 
+class PeekKeyIDTests(unittest.TestCase):
+    @staticmethod
+    def _raw_entry(identifier, value):
+        """Serialize a KEYCREDENTIALLINK_ENTRY as [Length(2)][Identifier(1)][Value]"""
+        return (
+            len(value).to_bytes(2, "little")
+            + bytes([KEYCREDENTIALLINK_ENTRY.identifiers[identifier]])
+            + value
+        )
+
+    _version_header = KEYCREDENTIALLINK_BLOB.KEY_CREDENTIAL_LINK_VERSION_2.to_bytes(
+        4, "little"
+    )
+
+    def test_peekKeyID_after_other_entries(self):
+        """Test that peekKeyID finds a KeyID located after other entries"""
+        key_id = hashlib.sha256(b"some key material").digest()
+        raw_blob = (
+            self._version_header
+            + self._raw_entry("KeyMaterial", b"some key material")
+            + self._raw_entry("KeyUsage", b"\x01")
+            + self._raw_entry("KeyID", key_id)
+            + self._raw_entry("KeySource", b"\x00")
+        )
+
+        self.assertEqual(peekKeyID(raw_blob), key_id)
+
+    def test_peekKeyID_no_keyid_entry(self):
+        """Test that peekKeyID raises IndexError when the blob has no KeyID"""
+        raw_blob = (
+            self._version_header
+            + self._raw_entry("KeyMaterial", b"some key material")
+            + self._raw_entry("KeyUsage", b"\x01")
+        )
+
+        with self.assertRaises(IndexError):
+            peekKeyID(raw_blob)
+
+    def test_peekKeyID_matches_getKeyID(self):
+        """Test that peekKeyID agrees with KEYCREDENTIALLINK_BLOB.getKeyID on a built blob"""
+        # Same mandatory entries as keyCredentialLink_from_x509 but with an
+        # arbitrary public key stand-in to stay offline
+        key_material = KEYCREDENTIALLINK_ENTRY(identifier="KeyMaterial")
+        key_material["Value"] = b"\x30\x82\x01\x0a" + b"\xab" * 270
+        key_id = KEYCREDENTIALLINK_ENTRY(identifier="KeyID")
+        key_id["Value"] = hashlib.sha256(key_material["Value"]).digest()
+        blob = KEYCREDENTIALLINK_BLOB()
+        blob["KEYCREDENTIALLINK_ENTRY_LIST"] = [key_id, key_material]
+
+        self.assertEqual(peekKeyID(blob.getData()), blob.getKeyID())
+
+
 if __name__ == '__main__':
     unittest.main()
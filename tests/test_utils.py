@@ -0,0 +1,99 @@
+import unittest
+from bloodyAD import utils
+from bloodyAD.formatters import accesscontrol, ldaptypes
+
+SID_A = "S-1-5-21-1111111111-2222222222-3333333333-1104"
+SID_B = "S-1-5-21-1111111111-2222222222-3333333333-1105"
+SID_OTHER = "S-1-5-21-1111111111-2222222222-3333333333-500"
+
+
+def createDenyACE(sid, access_mask=accesscontrol.ACCESS_FLAGS["FULL_CONTROL"]):
+    nace = ldaptypes.ACE()
+    nace["AceType"] = ldaptypes.ACCESS_DENIED_ACE.ACE_TYPE
+    nace["AceFlags"] = 0
+    acedata = ldaptypes.ACCESS_DENIED_ACE()
+    acedata["Mask"] = ldaptypes.ACCESS_MASK()
+    acedata["Mask"]["Mask"] = access_mask
+    acedata["Sid"] = ldaptypes.LDAP_SID()
+    acedata["Sid"].fromCanonical(sid)
+    nace["Ace"] = acedata
+    return nace
+
+
+class RightsTests(unittest.TestCase):
+    """
+    The return values of addRight/delRight decide whether the modified SD is
+    written back to the server, so pin down when they must report a change
+    """
+
+    def test_addRight_appends_new_ace(self):
+        """Test that addRight returns True when the allow ACE is missing"""
+        sd = accesscontrol.createEmptySD()
+
+        self.assertTrue(utils.addRight(sd, SID_A))
+        self.assertEqual(len(sd["Dacl"].aces), 1)
+        self.assertEqual(
+            sd["Dacl"].aces[0]["AceType"], ldaptypes.ACCESS_ALLOWED_ACE.ACE_TYPE
+        )
+
+    def test_addRight_true_when_only_deny_removed(self):
+        """Test that removing an interfering deny ACE counts as an SD change"""
+        sd = accesscontrol.createEmptySD()
+        sd["Dacl"].aces.append(createDenyACE(SID_A))
+        sd["Dacl"].aces.append(accesscontrol.createACE(SID_A))
+
+        # The allow ACE already grants the right but the deny removal still
+        # has to be written back
+        self.assertTrue(utils.addRight(sd, SID_A))
+        remaining_types = [ace["AceType"] for ace in sd["Dacl"].aces]
+        self.assertNotIn(ldaptypes.ACCESS_DENIED_ACE.ACE_TYPE, remaining_types)
+        self.assertEqual(len(sd["Dacl"].aces), 1)
+
+    def test_addRight_false_on_noop(self):
+        """Test that addRight returns False when the right already exists untouched"""
+        sd = accesscontrol.createEmptySD()
+        sd["Dacl"].aces.append(accesscontrol.createACE(SID_A))
+
+        self.assertFalse(utils.addRight(sd, SID_A))
+        self.assertEqual(len(sd["Dacl"].aces), 1)
+
+    def test_delRight_multiple_sids(self):
+        """Test that delRight removes every emptied ACE of the provided SIDs without corrupting positions"""
+        sd = accesscontrol.createEmptySD()
+        sd["Dacl"].aces.append(accesscontrol.createACE(SID_A))
+        sd["Dacl"].aces.append(accesscontrol.createACE(SID_OTHER))
+        sd["Dacl"].aces.append(accesscontrol.createACE(SID_B))
+
+        self.assertTrue(utils.delRight(sd, [SID_A, SID_B]))
+        self.assertEqual(len(sd["Dacl"].aces), 1)
+        self.assertEqual(sd["Dacl"].aces[0]["Ace"]["Sid"].formatCanonical(), SID_OTHER)
+
+    def test_delRight_keeps_partially_stripped_ace(self):
+        """Test that an ACE keeping other privileges survives a partial mask removal"""
+        sd = accesscontrol.createEmptySD()
+        sd["Dacl"].aces.append(accesscontrol.createACE(SID_A))
+
+        self.assertTrue(
+            utils.delRight(
+                sd,
+                [SID_A],
+                accesscontrol.ACCESS_FLAGS["ADS_RIGHT_DS_CONTROL_ACCESS"],
+            )
+        )
+        self.assertEqual(len(sd["Dacl"].aces), 1)
+        remaining_mask = sd["Dacl"].aces[0]["Ace"]["Mask"]["Mask"]
+        self.assertFalse(
+            remaining_mask & accesscontrol.ACCESS_FLAGS["ADS_RIGHT_DS_CONTROL_ACCESS"]
+        )
+
+    def test_delRight_false_on_noop(self):
+        """Test that delRight returns False when no ACE matches the SIDs"""
+        sd = accesscontrol.createEmptySD()
+        sd["Dacl"].aces.append(accesscontrol.createACE(SID_OTHER))
+
+        self.assertFalse(utils.delRight(sd, [SID_A, SID_B]))
+        self.assertEqual(len(sd["Dacl"].aces), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()